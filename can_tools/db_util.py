@@ -20,7 +20,7 @@ def fast_append_to_sql(
     temp_df = df.reset_index()
 
     # make sure we have the columns
-    have_cols = set(list(temp_df))
+    have_cols = set(temp_df.columns)
     missing_cols = set(cols) - have_cols
     if len(missing_cols) > 0:
         msg = "Missing columns {}".format(", ".join(list(missing_cols)))
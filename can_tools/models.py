@@ -1,4 +1,5 @@
 from contextlib import closing
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Tuple, Type, Union
 
@@ -14,6 +15,7 @@ from sqlalchemy import (
     Integer,
     Numeric,
     String,
+    bindparam,
     event,
 )
 from sqlalchemy.engine.base import Engine
@@ -363,10 +365,10 @@ class TemptableOfficialNoLocation(Base, _TempOfficial, DataSchemaMixin):
     )
 
 
-def build_insert_from_temp(
-    insert_op: str,
+@lru_cache(maxsize=32)
+def _insert_from_temp_template(
     cls: Union[Type[TemptableOfficialNoLocation], Type[TemptableOfficialHasLocation]],
-    engine: Engine,
+    dialect_name: str,
 ):
     columns = [
         cls.dt,
@@ -380,7 +382,7 @@ def build_insert_from_temp(
     ]
     selector = (
         select(columns)
-        .where(cls.insert_op == insert_op)
+        .where(cls.insert_op == bindparam("insert_op"))
         .select_from(
             (
                 cls.__table__.join(Location, isouter=True)
@@ -399,7 +401,7 @@ def build_insert_from_temp(
         )
     )
     covid_official = CovidOfficial.__table__
-    if "postgres" in engine.dialect.name:
+    if "postgres" in dialect_name:
         from sqlalchemy.dialects.postgresql import insert
 
         ins = insert(covid_official)
@@ -418,6 +420,15 @@ def build_insert_from_temp(
     return ins.from_select([x.name for x in columns], selector)
 
 
+def build_insert_from_temp(
+    cls: Union[Type[TemptableOfficialNoLocation], Type[TemptableOfficialHasLocation]],
+    engine: Engine,
+):
+    # The statement only depends on the temp table and dialect, so it is
+    # built once. Execute it with `{"insert_op": insert_op}` as parameters
+    return _insert_from_temp_template(cls, engine.dialect.name)
+
+
 def _bootstrap_csv_to_orm(cls: Type[Base]):
     fn = cls.__tablename__ + ".csv"
     path = Path(__file__).parent / "bootstrap_data" / fn
@@ -109,7 +109,10 @@ class PennsylvaniaHospitals(PennsylvaniaCasesDeaths):
             ),
         }
 
-        df["dt"] = df["date"].map(self._esri_ts_to_dt)
+        df["dt"] = self._esri_ts_series_to_dt(df["date"])
+        if df["dt"].isna().any():
+            bad = df.loc[df["dt"].isna(), "date"].tolist()
+            raise ValueError("Could not convert these dates: {}".format(bad))
 
         out = df.melt(
             id_vars=["location_name", "dt"], value_vars=crename.keys()
@@ -1,12 +1,20 @@
+import io
+import os
 import uuid
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
-from typing import Any, Dict, List, Optional, Tuple, Union
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from urllib.parse import urlencode
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.orm.session import sessionmaker
+from urllib3.util.retry import Retry
 
 from can_tools.db_util import fast_append_to_sql
 from can_tools.models import (
@@ -16,6 +24,100 @@ from can_tools.models import (
 )
 from can_tools.scrapers.base import DatasetBase
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+
+def http_adapter() -> HTTPAdapter:
+    """
+    Create a pooled `HTTPAdapter` that retries connection errors and
+    transient server errors with exponential backoff. Once the retries are
+    used up the last response is returned, so callers can check `res.ok`
+    """
+    retries = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+    return HTTPAdapter(max_retries=retries, pool_connections=10, pool_maxsize=20)
+
+
+def _http_session(cache_name: Union[str, Path], expire_after: int) -> requests.Session:
+    """
+    Create a session for ArcGIS and SODA requests
+
+    The connection pool is shared across requests, so paginated scrapes
+    reuse the same keep-alive connection instead of paying a new TCP+TLS
+    handshake per page. Connection errors and transient server errors are
+    retried with exponential backoff.
+
+    Setting the `CAN_HTTP_CACHE` environment variable (and having
+    requests-cache installed) stores responses in a sqlite database at
+    `cache_name` and reuses them for up to `expire_after` seconds. The cache
+    does not revalidate with the server, so a rerun inside that window gets
+    the earlier data under a new vintage. It is off by default and only meant
+    for local development
+    """
+    if requests_cache is not None and bool(os.environ.get("CAN_HTTP_CACHE", False)):
+        session = requests_cache.CachedSession(
+            cache_name=str(cache_name), backend="sqlite", expire_after=expire_after
+        )
+    else:
+        session = requests.Session()
+    adapter = http_adapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip"})
+
+    return session
+
+
+def _records_to_df(records: List[Dict]) -> pd.DataFrame:
+    """
+    Build a DataFrame from a list of dicts, one per row
+
+    Uses pyarrow's columnar conversion when every column holds scalar
+    values. Falls back to `pd.DataFrame.from_records` when pyarrow is not
+    installed, a column holds nested values (dicts or lists), or pyarrow
+    cannot infer a single type for a column
+    """
+    if pa is not None and len(records) > 0:
+        try:
+            # Infer the schema from every row, not just the first one, so
+            # keys missing from some rows are still kept
+            arr = pa.array(records)
+        except (pa.ArrowException, OverflowError):
+            arr = None
+
+        # Nested values would come back with their keys merged across rows
+        # and lists as numpy arrays, so only scalar columns use pyarrow
+        if (
+            arr is not None
+            and pa.types.is_struct(arr.type)
+            and not any(pa.types.is_nested(field.type) for field in arr.type)
+        ):
+            table = pa.Table.from_arrays(
+                arr.flatten(), names=[field.name for field in arr.type]
+            )
+            return table.to_pandas()
+
+    return pd.DataFrame.from_records(records)
+
 
 class StateDashboard(DatasetBase, ABC):
     """
@@ -56,7 +158,7 @@ class StateDashboard(DatasetBase, ABC):
         to_ins = df.rename(columns={"vintage": "last_updated"}).assign(
             insert_op=insert_op, provider=self.provider, state_fips=self.state_fips
         )
-        if "location_type" not in list(to_ins):
+        if "location_type" not in to_ins.columns:
             to_ins["location_type"] = self.location_type
 
         return to_ins, insert_op
@@ -79,8 +181,8 @@ class StateDashboard(DatasetBase, ABC):
                 print("Inserted all rows to temp table")
 
                 # then insert from temp table
-                ins = build_insert_from_temp(insert_op, table, engine)
-                res = sess.execute(ins)
+                ins = build_insert_from_temp(table, engine)
+                res = sess.execute(ins, {"insert_op": insert_op})
                 sess.commit()
                 print("Inserted {} rows".format(res.rowcount))
                 worked = True
@@ -121,7 +223,7 @@ class FederalDashboard(StateDashboard, ABC):
         to_ins = df.rename(columns={"vintage": "last_updated"}).assign(
             insert_op=insert_op, provider=self.provider
         )
-        if "location_type" not in list(to_ins):
+        if "location_type" not in to_ins.columns:
             to_ins["location_type"] = self.location_type
 
         return to_ins, insert_op
@@ -141,6 +243,16 @@ class ArcGIS(StateDashboard, ABC):
 
     ARCGIS_ID: str
 
+    # Default parameter values
+    _DEFAULT_PARAMS: Mapping[str, Union[int, str]] = MappingProxyType(
+        {
+            "f": "json",
+            "where": "0=0",
+            "outFields": "*",
+            "returnGeometry": "false",
+        }
+    )
+
     def __init__(
         self,
         execution_dt: pd.Timestamp = pd.Timestamp.utcnow(),
@@ -148,20 +260,33 @@ class ArcGIS(StateDashboard, ABC):
     ):
         super().__init__(execution_dt)
 
-        # Default parameter values
         if params is None:
-            params: Dict[str, Union[int, str]] = {
-                "f": "json",
-                "where": "0=0",
-                "outFields": "*",
-                "returnGeometry": "false",
-            }
+            params = dict(self._DEFAULT_PARAMS)
 
         self.params = params
+        self.session = _http_session(self.base_path / "arcgis_http_cache", 3600)
 
     def _esri_ts_to_dt(self, ts: int) -> pd.Timestamp:
-        """Convert unix timestamp from ArcGIS to pandas Timestamp"""
-        return pd.Timestamp.fromtimestamp(ts / 1000).normalize()
+        """
+        Convert unix timestamp from ArcGIS to pandas Timestamp
+
+        Prefer `_esri_ts_series_to_dt` when converting a whole column. See it
+        for how timestamps are interpreted. Returns `NaT` for a value that
+        cannot be converted
+        """
+        return self._esri_ts_series_to_dt(pd.Series([ts])).iloc[0]
+
+    def _esri_ts_series_to_dt(self, s: pd.Series) -> pd.Series:
+        """
+        Convert a Series of unix timestamps (in milliseconds) from ArcGIS to
+        dates
+
+        Timestamps are interpreted as UTC (not the machine's local time) and
+        truncated to midnight. Values that cannot be converted become `NaT`,
+        so callers must check for them if those rows should not be dropped
+        later on (e.g. by `dropna`)
+        """
+        return pd.to_datetime(s, unit="ms", errors="coerce").dt.normalize()
 
     def arcgis_query_url(self, service: str, sheet: Union[str, int], srvid: str) -> str:
         """
@@ -191,7 +316,11 @@ class ArcGIS(StateDashboard, ABC):
         return out
 
     def get_single_json(
-        self, service: str, sheet: Union[str, int], srvid: str, params: Dict[str, Any]
+        self,
+        service: str,
+        sheet: Union[str, int],
+        srvid: str,
+        params: Union[Dict[str, Any], str],
     ) -> dict:
         """
         Execute request and return response json as dict
@@ -199,10 +328,11 @@ class ArcGIS(StateDashboard, ABC):
         ----------
         service, sheet, srvid :
             See `arcgis_query_url` method
-        params : dict
+        params : dict or str
             A dictionary of additional parameters to pass as the `params` argument
-            to the `requests.get` method. These are turned into http query
-            parameters by requests
+            to the `self.session.get` method. These are turned into http query
+            parameters by requests. An already encoded query string is passed
+            through unchanged
 
         Returns
         -------
@@ -212,9 +342,9 @@ class ArcGIS(StateDashboard, ABC):
         """
         # Perform actual request
         url = self.arcgis_query_url(service=service, sheet=sheet, srvid=srvid)
-        res = requests.get(url, params=params)
+        res = self.session.get(url, params=params)
 
-        return res.json()
+        return json_loads(res.content)
 
     def get_all_jsons(
         self, service: str, sheet: Union[str, int], srvid: str
@@ -232,12 +362,12 @@ class ArcGIS(StateDashboard, ABC):
         the_jsons: list
             A dict containing the JSON response from the making the HTTP request
         """
-        # Get a copy so that we don't screw up main parameters
-        curr_params = self.params.copy()
+        # Encode the query string once and only append the offset per page
+        query = urlencode(self.params, doseq=True)
 
         # Get first request and determine number of requests that come per
         # response
-        res_json = self.get_single_json(service, sheet, srvid, curr_params)
+        res_json = self.get_single_json(service, sheet, srvid, query)
         total_offset = len(res_json["features"])
 
         # Use first response to create first DataFrame
@@ -245,8 +375,8 @@ class ArcGIS(StateDashboard, ABC):
         unbroken_chain = res_json.get("exceededTransferLimit", False)
         while unbroken_chain:
             # Update parameters and make request
-            curr_params.update({"resultOffset": total_offset})
-            res_json = self.get_single_json(service, sheet, srvid, curr_params)
+            page_query = f"{query}&resultOffset={total_offset}"
+            res_json = self.get_single_json(service, sheet, srvid, page_query)
 
             # Convert to DataFrame and store in df list
             the_jsons.append(res_json)
@@ -256,6 +386,83 @@ class ArcGIS(StateDashboard, ABC):
 
         return the_jsons
 
+    def get_all_jsons_parallel(
+        self, service: str, sheet: Union[str, int], srvid: str, max_workers: int = 8
+    ) -> List[Dict]:
+        """
+        Request all pages of a sheet concurrently
+
+        A `returnCountOnly` query determines the total number of records and
+        the first page determines the number of records the server returns
+        per response. The remaining pages are then requested in a thread pool.
+        If records were added after the count was taken, the pages past the
+        counted records are requested one at a time as in `get_all_jsons`.
+        Services that do not support `returnCountOnly` should use
+        `get_all_jsons` instead
+
+        Parameters
+        ----------
+        service, sheet, srvid :
+            See `arcgis_query_url` method
+        max_workers : int
+            Maximum number of pages to request at the same time
+
+        Returns
+        -------
+        the_jsons: list
+            A list of the JSON responses, ordered by `resultOffset`
+        """
+        # Determine total number of records in the sheet
+        count_params = dict(self.params, returnCountOnly="true", f="json")
+        count = self.get_single_json(service, sheet, srvid, count_params)["count"]
+
+        # Encode the query string once and only append the offset per page
+        query = urlencode(self.params, doseq=True)
+
+        # Get first request and determine number of records per response
+        res_json = self.get_single_json(service, sheet, srvid, query)
+        page_size = len(res_json["features"])
+        if page_size == 0 or not res_json.get("exceededTransferLimit", False):
+            return [res_json]
+
+        def get_page(offset: int) -> Dict:
+            page_query = f"{query}&resultOffset={offset}"
+            return self.get_single_json(service, sheet, srvid, page_query)
+
+        # `map` yields results in the order of the offsets
+        offsets = range(page_size, count, page_size)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            the_jsons = [res_json] + list(pool.map(get_page, offsets))
+
+        # Keep requesting if the sheet grew after the count was taken
+        total_offset = sum(len(x["features"]) for x in the_jsons)
+        unbroken_chain = the_jsons[-1].get("exceededTransferLimit", False)
+        while unbroken_chain:
+            res_json = get_page(total_offset)
+            the_jsons.append(res_json)
+
+            total_offset += len(res_json["features"])
+            unbroken_chain = res_json.get("exceededTransferLimit", False)
+
+        return the_jsons
+
+    def arcgis_json_to_records(self, res_json: dict) -> List[Dict]:
+        """
+        Extract the records from the json returned from the main HTTP request
+
+        Parameters
+        ----------
+        res_json : dict
+            Dict representation of JSON response from making HTTP call
+
+        Returns
+        -------
+        records: List[Dict]
+            The attributes field of each element of `res_json["features"]`
+
+        """
+        return [x["attributes"] for x in res_json["features"]]
+
     def arcgis_json_to_df(self, res_json: dict) -> pd.DataFrame:
         """
         Parse the json returned from the main HTTP request into a DataFrame
@@ -271,7 +478,7 @@ class ArcGIS(StateDashboard, ABC):
             `res_json["features"]` dict
 
         """
-        df = pd.DataFrame.from_records([x["attributes"] for x in res_json["features"]])
+        df = _records_to_df(self.arcgis_json_to_records(res_json))
 
         return df
 
@@ -289,10 +496,12 @@ class ArcGIS(StateDashboard, ABC):
         df: pd.DataFrame
             A DataFrame containing full contents of the requested ArcGIS sheet
         """
-        # Concat data
-        return pd.concat(
-            [self.arcgis_json_to_df(x) for x in data], axis=0, ignore_index=True
-        )
+        # Collect records from every page and build the DataFrame only once
+        records = []
+        for res_json in data:
+            records.extend(self.arcgis_json_to_records(res_json))
+
+        return _records_to_df(records)
 
 
 class SODA(StateDashboard, ABC):
@@ -313,6 +522,7 @@ class SODA(StateDashboard, ABC):
     ):
         super(SODA, self).__init__()
         self.params = params
+        self.session = _http_session(self.base_path / "soda_http_cache", 300)
 
     def soda_query_url(
         self, data_id: str, resource: str = "resource", ftype: str = "json"
@@ -351,9 +561,12 @@ class SODA(StateDashboard, ABC):
 
         """
         url = self.soda_query_url(data_id, resource, ftype)
-        res = requests.get(url)
+        res = self.session.get(url)
+
+        if ftype == "csv":
+            return pd.read_csv(io.BytesIO(res.content))
 
-        df = pd.DataFrame(res.json())
+        df = _records_to_df(json_loads(res.content))
 
         return df
 
@@ -1,11 +1,13 @@
 import random
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
 import pandas as pd
 import us
 
 from can_tools.scrapers.base import CMU
-from can_tools.scrapers.official.base import FederalDashboard
+from can_tools.scrapers.official.base import FederalDashboard, http_adapter
 
 
 class CDCCovidDataTracker(FederalDashboard):
@@ -25,13 +27,17 @@ class CDCCovidDataTracker(FederalDashboard):
         # Iterate through the states collecting the time-series data
         if test:
             # When testing, choos random 3 states
-            urls = map(
-                lambda x: fetcher_url.format(x.abbr.lower()),
-                random.sample(us.STATES, 3),
-            )
+            states = random.sample(us.STATES, 3)
         else:
-            urls = map(lambda x: fetcher_url.format(x.abbr.lower()), us.STATES)
-        responses = list(map(requests.get, urls))
+            states = us.STATES
+        urls = [fetcher_url.format(x.abbr.lower()) for x in states]
+
+        # Request the states concurrently over one pooled session that
+        # retries transient failures
+        with requests.Session() as session:
+            session.mount("https://", http_adapter())
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                responses = list(pool.map(session.get, urls))
         bad_idx = [i for (i, r) in enumerate(responses) if not r.ok]
         if len(bad_idx):
             bad_urls = "\n".join([urls[i] for i in bad_idx])
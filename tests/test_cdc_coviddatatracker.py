@@ -0,0 +1,81 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+import us
+
+from can_tools.scrapers.official.base import http_adapter
+from can_tools.scrapers.official.federal.CDC import cdc_coviddatatracker
+from can_tools.scrapers.official.federal.CDC.cdc_coviddatatracker import (
+    CDCCovidDataTracker,
+)
+
+
+class _FakeSession:
+    """
+    Stand in for `requests.Session` that answers every state url with a
+    small json payload, except for the states in `bad` which get a 503
+    """
+
+    def __init__(self, bad=()):
+        self.bad = bad
+        self.urls = []
+        self.mounted = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def mount(self, prefix, adapter):
+        self.mounted[prefix] = adapter
+
+    def get(self, url):
+        with self._lock:
+            self.urls.append(url)
+        state = url.rsplit("_state_", 1)[1].split("_")[0]
+        ok = state not in self.bad
+        return SimpleNamespace(
+            ok=ok, status_code=200 if ok else 503, json=lambda: {"state": state}
+        )
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    return CDCCovidDataTracker()
+
+
+def _patch_session(monkeypatch, session):
+    monkeypatch.setattr(cdc_coviddatatracker.requests, "Session", lambda: session)
+
+
+def test_fetch_returns_states_in_order(scraper, monkeypatch):
+    session = _FakeSession()
+    _patch_session(monkeypatch, session)
+
+    data = scraper.fetch()
+
+    assert [x["state"] for x in data] == [x.abbr.lower() for x in us.STATES]
+    assert len(set(session.urls)) == len(session.urls) == len(us.STATES)
+    assert session.mounted["https://"].max_retries.total == 5
+
+
+def test_fetch_reports_all_bad_urls(scraper, monkeypatch):
+    _patch_session(monkeypatch, _FakeSession(bad=("ca", "ny")))
+
+    with pytest.raises(ValueError) as exc:
+        scraper.fetch()
+
+    msg = str(exc.value)
+    assert "state_ca_external" in msg
+    assert "state_ny_external" in msg
+    assert "state_tx_external" not in msg
+
+
+def test_http_adapter_returns_final_response():
+    # the last 5xx response is returned instead of raising RetryError so
+    # callers can collect every failed url
+    assert http_adapter().max_retries.raise_on_status is False
@@ -0,0 +1,122 @@
+from contextlib import closing
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.expression import select
+
+import can_tools
+from can_tools.db_util import fast_append_to_sql
+from can_tools.models import (
+    CovidOfficial,
+    TemptableOfficialHasLocation,
+    build_insert_from_temp,
+    create_dev_engine,
+)
+from can_tools.scrapers.official import base as official_base
+from can_tools.scrapers.official.base import StateDashboard
+
+
+class _FakeDashboard(StateDashboard):
+    has_location = True
+    location_type = "county"
+    state_fips = 0
+    source = "https://example.com"
+
+    def fetch(self):
+        pass
+
+    def normalize(self, data):
+        pass
+
+
+@pytest.fixture
+def engine():
+    engine, _ = create_dev_engine(verbose=False)
+    return engine
+
+
+@pytest.fixture
+def dashboard(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    return _FakeDashboard()
+
+
+@pytest.fixture
+def locations():
+    df = pd.read_csv(
+        Path(can_tools.__file__).parent / "bootstrap_data" / "locations.csv"
+    )
+    return df.query("location_type == 'county'")["location"].astype(int).tolist()
+
+
+def _covid_df(location: int, dt: str, value: float) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "vintage": [pd.Timestamp.utcnow().floor("h")],
+            "dt": [pd.Timestamp(dt)],
+            "location": [location],
+            "category": ["cases"],
+            "measurement": ["cumulative"],
+            "unit": ["people"],
+            "age": ["all"],
+            "race": ["all"],
+            "sex": ["all"],
+            "value": [value],
+        }
+    )
+
+
+def _official_rows(engine):
+    table = CovidOfficial.__table__
+    stmt = select([table.c.location, table.c.dt, table.c.value])
+    with closing(engine.connect()) as con:
+        return {(r[0], str(r[1]), float(r[2])) for r in con.execute(stmt)}
+
+
+def test_put_twice_reuses_insert_statement(
+    engine, dashboard, locations, monkeypatch, capsys
+):
+    statements = []
+
+    def spy(cls, engine):
+        statement = build_insert_from_temp(cls, engine)
+        statements.append(statement)
+        return statement
+
+    monkeypatch.setattr(official_base, "build_insert_from_temp", spy)
+
+    assert dashboard.put(engine, _covid_df(locations[0], "2020-12-01", 5))
+    assert dashboard.put(engine, _covid_df(locations[1], "2020-12-02", 7))
+
+    assert len(statements) == 2
+    assert statements[0] is statements[1]
+    assert capsys.readouterr().out.count("Inserted 1 rows\n") == 2
+    assert _official_rows(engine) == {
+        (locations[0], "2020-12-01", 5.0),
+        (locations[1], "2020-12-02", 7.0),
+    }
+
+
+def test_insert_from_temp_only_inserts_its_insert_op(engine, dashboard, locations):
+    first, first_op = dashboard._prep_df(_covid_df(locations[0], "2020-12-01", 5))
+    second, second_op = dashboard._prep_df(_covid_df(locations[1], "2020-12-02", 7))
+    table = TemptableOfficialHasLocation
+    fast_append_to_sql(pd.concat([first, second]), engine, table)
+
+    statement = build_insert_from_temp(table, engine)
+    with closing(sessionmaker(engine)()) as sess:
+        res = sess.execute(statement, {"insert_op": first_op})
+        sess.commit()
+    assert res.rowcount == 1
+    assert _official_rows(engine) == {(locations[0], "2020-12-01", 5.0)}
+
+    with closing(sessionmaker(engine)()) as sess:
+        res = sess.execute(statement, {"insert_op": second_op})
+        sess.commit()
+    assert res.rowcount == 1
+    assert _official_rows(engine) == {
+        (locations[0], "2020-12-01", 5.0),
+        (locations[1], "2020-12-02", 7.0),
+    }
@@ -0,0 +1,220 @@
+import json
+import threading
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+
+import pandas as pd
+import pytest
+
+from can_tools.scrapers.official.base import SODA, ArcGIS, _records_to_df
+
+
+class _FakeArcGIS(ArcGIS):
+    ARCGIS_ID = "fake"
+    has_location = True
+    location_type = "county"
+    state_fips = 0
+    source = "https://example.com"
+
+    def fetch(self):
+        pass
+
+    def normalize(self, data):
+        pass
+
+
+class _FakeArcGISSession:
+    """
+    Stand in for `requests.Session` that serves an ArcGIS layer with `n`
+    records, `page_size` at a time. `n_late` records are added to the layer
+    after the `returnCountOnly` query has been answered
+    """
+
+    def __init__(self, n: int, page_size: int, n_late: int = 0):
+        self.n = n
+        self.page_size = page_size
+        self.n_late = n_late
+        self.offsets = []
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None):
+        if isinstance(params, str):
+            with self._lock:
+                self.queries.append(parse_qsl(params))
+            params = dict(parse_qsl(params))
+
+        if params.get("returnCountOnly") == "true":
+            out = {"count": self.n}
+        else:
+            offset = int(params.get("resultOffset", 0))
+            with self._lock:
+                self.offsets.append(offset)
+            total = self.n + self.n_late
+            stop = min(offset + self.page_size, total)
+            out = {
+                "features": [{"attributes": {"i": i}} for i in range(offset, stop)],
+                "exceededTransferLimit": stop < total,
+            }
+
+        return SimpleNamespace(content=json.dumps(out).encode())
+
+
+@pytest.fixture
+def arcgis(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    return _FakeArcGIS()
+
+
+def _record_ids(the_jsons):
+    return [x["attributes"]["i"] for js in the_jsons for x in js["features"]]
+
+
+@pytest.mark.parametrize("n", [0, 3, 5, 23, 25])
+def test_get_all_jsons_parallel_matches_serial(arcgis, n):
+    arcgis.session = _FakeArcGISSession(n, page_size=5)
+    parallel = arcgis.get_all_jsons_parallel("service", 0, 1, max_workers=4)
+
+    arcgis.session = _FakeArcGISSession(n, page_size=5)
+    serial = arcgis.get_all_jsons("service", 0, 1)
+
+    assert parallel == serial
+    assert _record_ids(parallel) == list(range(n))
+
+
+def test_get_all_jsons_parallel_offsets(arcgis):
+    arcgis.session = _FakeArcGISSession(23, page_size=5)
+    the_jsons = arcgis.get_all_jsons_parallel("service", 0, 1, max_workers=4)
+
+    assert [len(x["features"]) for x in the_jsons] == [5, 5, 5, 5, 3]
+    assert sorted(arcgis.session.offsets) == [0, 5, 10, 15, 20]
+
+
+def test_get_all_jsons_parallel_layer_grows(arcgis):
+    arcgis.session = _FakeArcGISSession(23, page_size=5, n_late=9)
+    the_jsons = arcgis.get_all_jsons_parallel("service", 0, 1, max_workers=4)
+
+    assert _record_ids(the_jsons) == list(range(32))
+    assert not the_jsons[-1]["exceededTransferLimit"]
+
+
+@pytest.mark.parametrize("method", ["get_all_jsons", "get_all_jsons_parallel"])
+def test_get_all_jsons_list_params(arcgis, method):
+    arcgis.params["outFields"] = ["a", "b"]
+    arcgis.session = _FakeArcGISSession(12, page_size=5)
+    getattr(arcgis, method)("service", 0, 1)
+
+    # Lists are sent as repeated keys, the same way requests encodes them
+    for query in arcgis.session.queries:
+        assert [v for k, v in query if k == "outFields"] == ["a", "b"]
+
+
+@pytest.mark.parametrize(
+    "records",
+    [
+        [],
+        [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}],
+        # missing keys
+        [{"a": 1, "b": "x"}, {"a": 2, "c": 3.5}, {"b": None}],
+        # mixed types
+        [{"a": 1}, {"a": 2.5}],
+        [{"a": 1}, {"a": "x"}],
+        [{"a": True}, {"a": None}],
+        [{"a": None}, {"a": None}],
+        [{"a": 2**63}],
+        # nested values
+        [{"a": {"coordinates": [1, 2], "type": "Point"}}, {"a": {"latitude": "3"}}],
+        [{"a": [1, 2], "b": 1}, {"a": [3], "b": 2}],
+    ],
+)
+def test_records_to_df_matches_from_records(records):
+    got = _records_to_df(records)
+    want = pd.DataFrame.from_records(records)
+
+    pd.testing.assert_frame_equal(got, want)
+    # nested values are kept as the original python objects. Missing values
+    # may be None or NaN depending on the pandas version, so skip them
+    for col in got.columns:
+        for g, w in zip(got[col], want[col]):
+            if pd.api.types.is_scalar(w) and pd.isna(w):
+                assert pd.isna(g)
+            else:
+                assert type(g) is type(w)
+
+
+class _FakeSODA(SODA):
+    baseurl = "https://example.com"
+    has_location = True
+    location_type = "county"
+    state_fips = 0
+    source = "https://example.com"
+
+    def fetch(self):
+        pass
+
+    def normalize(self, data):
+        pass
+
+
+def test_soda_get_dataset_keeps_nested_columns(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    rows = [
+        {"county": "A", "cases": "1", "location": {"latitude": "1", "longitude": "2"}},
+        {"county": "B", "location": {"type": "Point", "coordinates": [1, 2]}},
+    ]
+    content = json.dumps(rows).encode()
+
+    soda = _FakeSODA(None)
+    soda.session = SimpleNamespace(get=lambda url: SimpleNamespace(content=content))
+    df = soda.get_dataset("abcd-1234")
+
+    pd.testing.assert_frame_equal(df, pd.DataFrame(rows))
+    assert df["location"].tolist() == [x["location"] for x in rows]
+
+
+def test_http_cache_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    monkeypatch.delenv("CAN_HTTP_CACHE", raising=False)
+    requests_cache = pytest.importorskip("requests_cache")
+
+    arcgis = _FakeArcGIS()
+
+    assert not isinstance(arcgis.session, requests_cache.CachedSession)
+    assert list(tmp_path.glob("*http_cache*")) == []
+
+
+def test_http_cache_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    monkeypatch.setenv("CAN_HTTP_CACHE", "1")
+    requests_cache = pytest.importorskip("requests_cache")
+
+    arcgis = _FakeArcGIS()
+
+    assert isinstance(arcgis.session, requests_cache.CachedSession)
+
+
+ESRI_TIMESTAMPS = [
+    # 2020-09-13 12:26:40 UTC, which is still 2020-09-13 in US time zones
+    (1600000000000, pd.Timestamp("2020-09-13")),
+    # midnight UTC, which is the evening before in US time zones
+    (1599955200000, pd.Timestamp("2020-09-13")),
+    (1600041599999, pd.Timestamp("2020-09-13")),
+    ("bad", pd.NaT),
+    (None, pd.NaT),
+]
+
+
+def test_esri_ts_series_to_dt(arcgis):
+    got = arcgis._esri_ts_series_to_dt(pd.Series([ts for ts, _ in ESRI_TIMESTAMPS]))
+
+    assert got.tolist() == [dt for _, dt in ESRI_TIMESTAMPS]
+
+
+@pytest.mark.parametrize("ts, want", ESRI_TIMESTAMPS)
+def test_esri_ts_to_dt(arcgis, ts, want):
+    got = arcgis._esri_ts_to_dt(ts)
+
+    if pd.isna(want):
+        assert pd.isna(got)
+    else:
+        assert got == want
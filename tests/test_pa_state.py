@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from can_tools.scrapers.official.PA.pa_state import PennsylvaniaHospitals
+
+
+def _hospital_jsons(dates):
+    features = [
+        {
+            "attributes": {
+                "County": "Adams",
+                "date": date,
+                "med_total": 10,
+                "covid_patients": 2,
+                "icu_total": 3,
+                "icu_avail": 1,
+            }
+        }
+        for date in dates
+    ]
+    return [{"features": features}]
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATAPATH", str(tmp_path))
+    return PennsylvaniaHospitals()
+
+
+def test_pre_normalize_dates(scraper):
+    df = scraper.pre_normalize(_hospital_jsons([1600000000000, 1599955200000]))
+
+    assert set(df["dt"]) == {pd.Timestamp("2020-09-13")}
+    assert len(df) == 2 * 4
+
+
+@pytest.mark.parametrize("bad", ["abc", None])
+def test_pre_normalize_raises_on_bad_date(scraper, bad):
+    with pytest.raises(ValueError, match="Could not convert"):
+        scraper.pre_normalize(_hospital_jsons([1600000000000, bad]))